@@ -1,22 +1,54 @@
 import os 
-import openai
 import streamlit as st
 import easyocr
 import numpy as np
+import cv2
 from PIL import Image
 import pandas as pd
 import requests
-import folium
 from streamlit_folium import st_folium
-from geopy.distance import geodesic
 import re
+import json
+import tempfile
+from ocr_backends import accelerate_reader
+from data_io import load_data, add_reading, apply_edits
+from maps import base_map
 
-# Initialize OpenAI API Key and OCR Reader
-openai.api_key = "API-KEY-HERE"
-reader = easyocr.Reader(['en'])
+# OCR batch settings: every image is resized to this fixed size, so cuDNN autotunes the detector once
+OCR_BATCH_SIZE = 8
+OCR_WIDTH, OCR_HEIGHT = 800, 600
+# Uploaded photos are downscaled so their longest side is at most this many pixels
+OCR_MAX_SIDE = 1600
 
-# Define CSV file to store water quality data
-DATA_FILE = "water_quality_data.csv"
+# Optional CPU inference backend for OCR ("torch", "openvino", or "onnxruntime"), ignored when a GPU is available
+OCR_BACKEND = os.environ.get("OCR_BACKEND", "torch")
+# Device for the openvino backend ("CPU", or "GPU" for Intel iGPUs); onnxruntime always runs on the CPU
+OPENVINO_DEVICE = os.environ.get("OPENVINO_DEVICE", "CPU")
+
+# Check once per process whether a GPU is available for OCR
+@st.cache_resource(show_spinner=False)
+def gpu_available():
+    try:
+        import torch
+        return torch.cuda.is_available()
+    except ImportError:
+        return False
+
+# Load the OCR model once per process instead of on every rerun
+@st.cache_resource(show_spinner="Loading the OCR model...")
+def get_reader():
+    gpu = gpu_available()
+    accelerate = not gpu and OCR_BACKEND != "torch"
+    # Dynamic quantization only helps PyTorch and blocks the ONNX export
+    reader = easyocr.Reader(['en'], gpu=gpu, cudnn_benchmark=gpu, quantize=not accelerate)
+    if accelerate:
+        reader = accelerate_reader(reader, OCR_BACKEND, device=OPENVINO_DEVICE)
+    # Warm up both the detector and the recognizer on a frame with text, at the fixed OCR size,
+    # so the first upload doesn't pay the cuDNN autotune cost
+    warmup_frame = np.full((OCR_HEIGHT, OCR_WIDTH), 255, dtype=np.uint8)
+    cv2.putText(warmup_frame, "pH 7.0 Chlorine 1.0", (40, OCR_HEIGHT // 2), cv2.FONT_HERSHEY_SIMPLEX, 2, 0, 4)
+    reader.readtext_batched([warmup_frame], n_width=OCR_WIDTH, n_height=OCR_HEIGHT, batch_size=OCR_BATCH_SIZE, detail=0)
+    return reader
 
 # Known coordinates for San Jose zip codes as fallback
 known_zipcode_coords = {
@@ -29,85 +61,114 @@ known_zipcode_coords = {
     "95120": (37.2060, -121.8133),
 }
 
-# Helper function to find nearest zipcode based on coordinates
+# Known zipcodes and their coordinates in radians, for vectorized distance lookups
+_ZIP_CODES = np.array(list(known_zipcode_coords.keys()))
+_ZIP_LATLON = np.radians(np.array(list(known_zipcode_coords.values())))
+
+# Helper function to find nearest zipcode based on coordinates (haversine distance)
 def get_nearest_zipcode(lat, lon):
-    min_distance = float("inf")
-    nearest_zipcode = None
-    for zipcode, coord in known_zipcode_coords.items():
-        distance = geodesic((lat, lon), coord).miles
-        if distance < min_distance:
-            min_distance = distance
-            nearest_zipcode = zipcode
-    return nearest_zipcode
+    lat_r, lon_r = np.radians(lat), np.radians(lon)
+    dlat = _ZIP_LATLON[:, 0] - lat_r
+    dlon = _ZIP_LATLON[:, 1] - lon_r
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat_r) * np.cos(_ZIP_LATLON[:, 0]) * np.sin(dlon / 2) ** 2
+    return str(_ZIP_CODES[np.argmin(a)])
+
+# Reverse-geocoding results persisted across restarts, keyed by rounded "lat,lon"
+ZIPCODE_CACHE_FILE = os.path.expanduser("~/.cache/zipcodes.json")
+
+# Reuse one HTTP session (and its connections) for all OpenStreetMap requests
+@st.cache_resource(show_spinner=False)
+def get_http_session():
+    session = requests.Session()
+    session.headers.update({"User-Agent": "water-quality-app"})  # Required by Nominatim's usage policy
+    return session
+
+# Load the persisted zipcode lookups once per process
+@st.cache_resource(show_spinner=False)
+def get_zipcode_cache():
+    try:
+        with open(ZIPCODE_CACHE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+# Look up the postcode for rounded coordinates, hitting the network only on a cache miss
+@st.cache_data(max_entries=4096, show_spinner=False)
+def _reverse_cached(lat_q, lon_q):
+    zipcode_cache = get_zipcode_cache()
+    key = f"{lat_q},{lon_q}"
+    if key not in zipcode_cache:
+        url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={lat_q}&lon={lon_q}&zoom=10&addressdetails=1"
+        response = get_http_session().get(url, timeout=2)
+        response.raise_for_status()
+        zipcode_cache[key] = response.json().get("address", {}).get("postcode")
+        # Save a snapshot, since other sessions may add keys meanwhile, and swap the file in atomically
+        snapshot = dict(zipcode_cache)
+        try:
+            os.makedirs(os.path.dirname(ZIPCODE_CACHE_FILE), exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(ZIPCODE_CACHE_FILE), suffix=".tmp", delete=False) as f:
+                json.dump(snapshot, f)
+            os.replace(f.name, ZIPCODE_CACHE_FILE)
+        except OSError:
+            pass
+    return zipcode_cache[key]
 
 # Function to get zipcode from coordinates using OpenStreetMap
+# Coordinates are rounded to 3 decimals (~110 m) so small mouse jitter reuses the cached lookup
 def get_zipcode_from_coordinates(lat, lon):
-    url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={lon}&zoom=10&addressdetails=1"
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        if "address" in data and "postcode" in data["address"]:
-            return data["address"]["postcode"]
-        else:
-            return get_nearest_zipcode(lat, lon)  # Fallback to nearest known zipcode
+        postcode = _reverse_cached(round(lat, 3), round(lon, 3))
     except requests.RequestException as e:
         st.warning(f"Could not connect to OpenStreetMap API: {e}")
         return get_nearest_zipcode(lat, lon)
+    return postcode or get_nearest_zipcode(lat, lon)  # Fallback to nearest known zipcode
 
-# Helper functions for loading and saving data
-def load_data():
-    if os.path.exists(DATA_FILE):
-        return pd.read_csv(DATA_FILE)
-    else:
-        return pd.DataFrame(columns=["Zipcode", "Date", "pH", "Chlorine (mg/L)", "Hardness (mg/L as CaCO3)", "Nitrates (mg/L)", "Lead (µg/L)"])
-
-def save_data(data):
-    data.to_csv(DATA_FILE, index=False)
-
-# Rerun page function
-def trigger_rerun():
-    if 'refresh' not in st.session_state:
-        st.session_state['refresh'] = True
-    else:
-        st.session_state['refresh'] = not st.session_state['refresh']
+# Keywords (lowercase) for each water quality parameter, combined into one pattern scanned in a single pass
+READING_KEYWORDS = {
+    "ph": "pH",
+    "chlorine": "Chlorine (mg/L)",
+    "hardness": "Hardness (mg/L as CaCO3)",
+    "nitrates": "Nitrates (mg/L)",
+    "lead": "Lead (µg/L)",
+}
+READING_PATTERN = re.compile(r"(?P<keyword>" + "|".join(READING_KEYWORDS) + r")[:\s]*(?P<value>[\d.]+)", re.IGNORECASE)
 
 # Function to parse extracted text and map to water quality parameters
 def parse_extracted_text(text):
-    patterns = {
-        "pH": r"pH[:\s]*([\d.]+)",
-        "Chlorine (mg/L)": r"Chlorine[:\s]*([\d.]+)",
-        "Hardness (mg/L as CaCO3)": r"Hardness[:\s]*([\d.]+)",
-        "Nitrates (mg/L)": r"Nitrates[:\s]*([\d.]+)",
-        "Lead (µg/L)": r"Lead[:\s]*([\d.]+)"
-    }
-    
     readings = {}
-    for param, pattern in patterns.items():
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            readings[param] = float(match.group(1))
+    for match in READING_PATTERN.finditer(text):
+        param = READING_KEYWORDS[match.group("keyword").lower()]
+        if param not in readings:  # Keep the first reading for each parameter
+            readings[param] = float(match.group("value"))
     return readings
 
-# Function to extract text from an image using EasyOCR
+# Downscale, grayscale, and binarize an image before OCR; detection cost grows with pixel count
+def prepare_image_for_ocr(image):
+    image = image.copy()
+    image.thumbnail((OCR_MAX_SIDE, OCR_MAX_SIDE), Image.LANCZOS)
+    gray = np.array(image.convert("L"))
+    return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 10)
+
+# Function to extract text from an image (or a list of images) using EasyOCR
+# Single images go through the same fixed-size batched path, so every upload reuses the autotuned detector
 def extract_text_from_image(image):
-    img = np.array(image)
-    results = reader.readtext(img)
-    extracted_text = " ".join([text for _, text, _ in results])
-    return extracted_text
+    images = image if isinstance(image, (list, tuple)) else [image]
+    results = get_reader().readtext_batched([prepare_image_for_ocr(img) for img in images], n_width=OCR_WIDTH, n_height=OCR_HEIGHT, batch_size=OCR_BATCH_SIZE, detail=0)
+    extracted_texts = [" ".join(texts) for texts in results]
+    return extracted_texts if isinstance(image, (list, tuple)) else extracted_texts[0]
 
 # Set up Streamlit interface
 st.title("Water Quality Dashboard")
 st.header("Choose Input Method")
 
+# Load (and warm up) the OCR model at page load rather than on the first upload
+get_reader()
+
 # Step 1: Location Selection with Zipcode Detection
 st.markdown("### Step 1: Select Your Location")
 st.write("Click on the map to choose your location. We’ll detect the zipcode automatically.")
 
-initial_location = [37.3382, -121.8863]
-m = folium.Map(location=initial_location, zoom_start=12)
-m.add_child(folium.LatLngPopup())
-map_output = st_folium(m)
+map_output = st_folium(base_map())
 
 zipcode = ""
 if map_output.get("last_clicked"):
@@ -125,18 +186,27 @@ zipcode = st.text_input("Confirm Zipcode", value=zipcode, max_chars=5)
 input_option = st.radio("Select Input Method:", ("Manual Input", "Image Upload"))
 
 # Collect water quality readings based on selected input method
+# Widgets live in a form so the page only reruns when the data is submitted
 readings = {}
-if input_option == "Manual Input":
-    readings = {
-        "pH": st.number_input("Enter pH level:", min_value=0.0, max_value=14.0, step=0.1),
-        "Chlorine (mg/L)": st.number_input("Enter Chlorine (mg/L):", min_value=0.0, max_value=10.0, step=0.1),
-        "Hardness (mg/L as CaCO3)": st.number_input("Enter Hardness (mg/L as CaCO3):", min_value=0.0, max_value=500.0, step=1.0),
-        "Nitrates (mg/L)": st.number_input("Enter Nitrates (mg/L):", min_value=0.0, max_value=50.0, step=0.1),
-        "Lead (µg/L)": st.number_input("Enter Lead (µg/L):", min_value=0.0, max_value=100.0, step=0.1)
-    }
-elif input_option == "Image Upload":
-    uploaded_file = st.file_uploader("Upload an image of your water test kit results...", type=["jpg", "jpeg", "png"])
-    if uploaded_file:
+with st.form("wq_form", clear_on_submit=True):
+    if input_option == "Manual Input":
+        manual_readings = {
+            "pH": st.number_input("Enter pH level:", min_value=0.0, max_value=14.0, step=0.1),
+            "Chlorine (mg/L)": st.number_input("Enter Chlorine (mg/L):", min_value=0.0, max_value=10.0, step=0.1),
+            "Hardness (mg/L as CaCO3)": st.number_input("Enter Hardness (mg/L as CaCO3):", min_value=0.0, max_value=500.0, step=1.0),
+            "Nitrates (mg/L)": st.number_input("Enter Nitrates (mg/L):", min_value=0.0, max_value=50.0, step=0.1),
+            "Lead (µg/L)": st.number_input("Enter Lead (µg/L):", min_value=0.0, max_value=100.0, step=0.1)
+        }
+    elif input_option == "Image Upload":
+        uploaded_file = st.file_uploader("Upload an image of your water test kit results...", type=["jpg", "jpeg", "png"])
+
+    # Submit Data button
+    submitted = st.form_submit_button("Submit Data")
+
+if submitted:
+    if input_option == "Manual Input":
+        readings = manual_readings
+    elif uploaded_file:
         image = Image.open(uploaded_file)
         st.image(image, caption="Uploaded Image", use_column_width=True)
         with st.spinner("Extracting text from the image..."):
@@ -149,53 +219,52 @@ elif input_option == "Image Upload":
         else:
             st.error("Failed to parse data. Ensure the image contains readable information.")
 
-# Submit Data button
-if st.button("Submit Data"):
     if zipcode and readings:
-        data = pd.DataFrame([{**readings, "Zipcode": zipcode, "Date": pd.Timestamp.now()}])
-        existing_data = load_data()
-        updated_data = pd.concat([existing_data, data], ignore_index=True)
-        save_data(updated_data)
+        add_reading({**readings, "Zipcode": zipcode, "Date": pd.Timestamp.now()})
         st.success("Data submitted successfully.")
     else:
         st.error("Please ensure all data fields are filled out, including a valid zipcode.")
 
-# Display existing data with Edit and Delete options
+# Display existing data in one editable table; rows can be edited, added, or deleted in place
 st.markdown("### Existing Data")
-data = load_data()
+if "wq_editor_message" in st.session_state:
+    st.success(st.session_state.pop("wq_editor_message"))
+data = load_data().astype({"Zipcode": str})  # Plain strings so the editor accepts new zipcodes
 if not data.empty:
-    for i, row in data.iterrows():
-        with st.expander(f"Entry {i+1} - Zipcode: {row['Zipcode']} | Date: {row['Date']}"):
-            col1, col2 = st.columns(2)
-
-            # Edit button
-            if col1.button("Edit", key=f"edit_{i}"):
-                edited_zipcode = st.text_input("Zipcode", value=row["Zipcode"], key=f"zipcode_{i}")
-                edited_date = st.date_input("Date", value=pd.to_datetime(row["Date"]), key=f"date_{i}")
-                edited_ph = st.number_input("pH", min_value=0.0, max_value=14.0, step=0.1, value=row["pH"], key=f"pH_{i}")
-                edited_chlorine = st.number_input("Chlorine (mg/L)", min_value=0.0, max_value=10.0, step=0.1, value=row["Chlorine (mg/L)"], key=f"chlorine_{i}")
-                edited_hardness = st.number_input("Hardness (mg/L as CaCO3)", min_value=0.0, max_value=500.0, step=1.0, value=row["Hardness (mg/L as CaCO3)"], key=f"hardness_{i}")
-                edited_nitrates = st.number_input("Nitrates (mg/L)", min_value=0.0, max_value=50.0, step=0.1, value=row["Nitrates (mg/L)"], key=f"nitrates_{i}")
-                edited_lead = st.number_input("Lead (µg/L)", min_value=0.0, max_value=100.0, step=0.1, value=row["Lead (µg/L)"], key=f"lead_{i}")
-
-                if st.button("Save Changes", key=f"save_{i}"):
-                    data.at[i, "Zipcode"] = edited_zipcode
-                    data.at[i, "Date"] = edited_date
-                    data.at[i, "pH"] = edited_ph
-                    data.at[i, "Chlorine (mg/L)"] = edited_chlorine
-                    data.at[i, "Hardness (mg/L as CaCO3)"] = edited_hardness
-                    data.at[i, "Nitrates (mg/L)"] = edited_nitrates
-                    data.at[i, "Lead (µg/L)"] = edited_lead
-                    save_data(data)
-                    st.success("Entry updated successfully.")
-                    trigger_rerun()
-
-            # Delete button
-            if col2.button("Delete", key=f"delete_{i}"):
-                data = data.drop(i).reset_index(drop=True)
-                save_data(data)
-                st.success("Entry deleted successfully.")
-                trigger_rerun()
+    # Bumping the version gives the editor a fresh key, dropping edits that are already saved
+    editor_version = st.session_state.get("wq_editor_version", 0)
+    editor_key = f"wq_editor_{editor_version}"
+    # Edits are row positions in the table the user saw, which may differ from the table just reloaded
+    # if another session changed the data meanwhile, so keep the ids of the last rendered table
+    ids_key = f"{editor_key}_ids"
+    rendered_ids = st.session_state.get(ids_key, list(data.index))
+    st.session_state[ids_key] = list(data.index)
+    with st.form("wq_editor_form"):
+        st.data_editor(
+            data,
+            num_rows="dynamic",
+            hide_index=True,
+            column_config={
+                "Zipcode": st.column_config.TextColumn("Zipcode", max_chars=5, required=True),
+                "Date": st.column_config.DatetimeColumn("Date", required=True),
+                "pH": st.column_config.NumberColumn("pH", min_value=0.0, max_value=14.0, step=0.1),
+                "Chlorine (mg/L)": st.column_config.NumberColumn("Chlorine (mg/L)", min_value=0.0, max_value=10.0, step=0.1),
+                "Hardness (mg/L as CaCO3)": st.column_config.NumberColumn("Hardness (mg/L as CaCO3)", min_value=0.0, max_value=500.0, step=1.0),
+                "Nitrates (mg/L)": st.column_config.NumberColumn("Nitrates (mg/L)", min_value=0.0, max_value=50.0, step=0.1),
+                "Lead (µg/L)": st.column_config.NumberColumn("Lead (µg/L)", min_value=0.0, max_value=100.0, step=0.1),
+            },
+            key=editor_key,
+        )
+
+        # Only the changed rows are written: deletes, updates, and inserts by row id
+        edits = st.session_state.get(editor_key, {})
+        if st.form_submit_button("Save Changes") and any(edits.get(change) for change in ("edited_rows", "added_rows", "deleted_rows")):
+            apply_edits(rendered_ids, edits)
+            st.session_state["wq_editor_version"] = editor_version + 1
+            del st.session_state[ids_key]
+            # Rerun so the fresh editor is on screen before any further edits; the message is shown after the rerun
+            st.session_state["wq_editor_message"] = "Changes saved successfully."
+            st.rerun()
 
 else:
     st.write("No data available yet. Add data using the input methods on the main page.")
@@ -1,16 +1,10 @@
 import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
-import folium
-from streamlit_folium import st_folium
-import os
-
-# Load data function
-DATA_FILE = "water_quality_data.csv"
-def load_data():
-    if os.path.isfile(DATA_FILE):
-        return pd.read_csv(DATA_FILE, parse_dates=["Date"], dtype={"Zipcode": str})
-    return pd.DataFrame(columns=["Zipcode", "Date", "pH", "Chlorine (mg/L)", "Hardness (mg/L as CaCO3)", "Nitrates (mg/L)", "Lead (µg/L)"])
+import altair as alt
+import numpy as np
+import pydeck as pdk
+from data_io import load_data
+from maps import MAP_CENTER
 
 # Define regulatory standards for water quality parameters
 REGULATORY_STANDARDS = {
@@ -39,13 +33,9 @@ st.markdown("### Step 1: Choose Analysis Parameters")
 selected_zipcodes = st.multiselect("Select Zipcodes for Analysis", options=data["Zipcode"].unique())
 selected_date_range = st.date_input("Select Date Range", [])
 
-# Filter data based on user input
-if selected_zipcodes and selected_date_range:
-    filtered_data = data[
-        data["Zipcode"].isin(selected_zipcodes) &
-        (data["Date"] >= pd.to_datetime(selected_date_range[0])) &
-        (data["Date"] <= pd.to_datetime(selected_date_range[1]))
-    ]
+# Filter data based on user input; the filter runs as a query in the database
+if selected_zipcodes and len(selected_date_range) == 2:
+    filtered_data = load_data(zipcodes=selected_zipcodes, start=selected_date_range[0], end=selected_date_range[1])
 else:
     filtered_data = data
 
@@ -57,41 +47,58 @@ else:
     st.warning("No data available for the selected parameters. Please adjust the filters or add data.")
 
 # Step 3: Historical Trends Visualization
+# All parameters are drawn in one faceted chart from a single long-format table
 st.markdown("### Step 3: Historical Trends by Parameter")
-for param, (min_val, max_val) in REGULATORY_STANDARDS.items():
-    if param in filtered_data.columns:
-        st.subheader(f"{param} Over Time")
-        plt.figure(figsize=(10, 4))
-        for zipcode in selected_zipcodes:
-            zip_data = filtered_data[filtered_data["Zipcode"] == zipcode]
-            if not zip_data.empty:
-                plt.plot(zip_data["Date"], zip_data[param], marker='o', label=f"Zipcode {zipcode}")
-        plt.axhline(y=min_val, color='green', linestyle='--', label=f"Min Standard ({min_val})")
-        plt.axhline(y=max_val, color='red', linestyle='--', label=f"Max Standard ({max_val})")
-        plt.fill_between(filtered_data["Date"], min_val, max_val, color='lightgreen', alpha=0.3)
-        plt.xlabel("Date")
-        plt.ylabel(param)
-        plt.title(f"{param} Levels Over Time")
-        plt.legend()
-        st.pyplot(plt)
+trend_params = [param for param in REGULATORY_STANDARDS if param in filtered_data.columns]
+trend_data = filtered_data[filtered_data["Zipcode"].isin(selected_zipcodes)].melt(
+    id_vars=["Zipcode", "Date"], value_vars=trend_params, var_name="Parameter", value_name="Value"
+)
+standards = pd.DataFrame(
+    [(param, min_val, max_val) for param, (min_val, max_val) in REGULATORY_STANDARDS.items() if param in trend_params],
+    columns=["Parameter", "min_standard", "max_standard"],
+)
+trend_data = trend_data.merge(standards, on="Parameter")
+if not trend_data.empty:
+    # Regulatory bands and limits, one per parameter
+    limits = alt.Chart().transform_aggregate(
+        min_standard="min(min_standard)", max_standard="max(max_standard)", groupby=["Parameter"]
+    )
+    safe_band = limits.mark_rect(color="lightgreen", opacity=0.3).encode(y="min_standard:Q", y2="max_standard:Q")
+    min_rule = limits.mark_rule(color="green", strokeDash=[4, 4]).encode(y="min_standard:Q")
+    max_rule = limits.mark_rule(color="red", strokeDash=[4, 4]).encode(y="max_standard:Q")
+    trend_lines = alt.Chart().mark_line(point=True).encode(
+        x=alt.X("Date:T", title="Date"),
+        y=alt.Y("Value:Q", title="Level"),
+        color=alt.Color("Zipcode:N", title="Zipcode"),
+        tooltip=["Zipcode:N", "Date:T", "Value:Q"],
+    )
+    trend_chart = alt.layer(safe_band, min_rule, max_rule, trend_lines, data=trend_data).properties(
+        width=600, height=200
+    ).facet(
+        row=alt.Row("Parameter:N", title=None, sort=trend_params)
+    ).resolve_scale(y="independent")
+    st.altair_chart(trend_chart)
+else:
+    st.info("Select zipcodes to view historical trends.")
 
 # Step 4: Compliance Monitoring and Alerts
+# All parameters are checked against their limits in one vectorized comparison
 st.markdown("### Step 4: Compliance Monitoring and Alerts")
-for param, (min_val, max_val) in REGULATORY_STANDARDS.items():
-    if param in filtered_data.columns:
-        non_compliant_data = filtered_data[(filtered_data[param] < min_val) | (filtered_data[param] > max_val)]
-        if not non_compliant_data.empty:
-            st.warning(f"**{param}** levels out of safe range in {len(non_compliant_data)} entries for selected period and zipcodes.")
-            st.write(non_compliant_data[["Zipcode", "Date", param]])
-        else:
-            st.success(f"All **{param}** values are within the regulatory standards for the selected period.")
+compliance_params = [param for param in REGULATORY_STANDARDS if param in filtered_data.columns]
+min_vals = np.array([REGULATORY_STANDARDS[param][0] for param in compliance_params])
+max_vals = np.array([REGULATORY_STANDARDS[param][1] for param in compliance_params])
+values = filtered_data[compliance_params].to_numpy(dtype=float)
+out_of_range = (values < min_vals) | (values > max_vals)
+for j, param in enumerate(compliance_params):
+    non_compliant_rows = np.flatnonzero(out_of_range[:, j])
+    if len(non_compliant_rows):
+        st.warning(f"**{param}** levels out of safe range in {len(non_compliant_rows)} entries for selected period and zipcodes.")
+        st.write(filtered_data.iloc[non_compliant_rows][["Zipcode", "Date", param]])
+    else:
+        st.success(f"All **{param}** values are within the regulatory standards for the selected period.")
 
 # Step 5: Interactive Map for Zipcode-based Analysis
 st.markdown("### Step 5: Interactive Map for Zipcode-based Analysis")
-map_center = [37.3382, -121.8863]  # Centered on San Jose
-
-# Initialize map
-m = folium.Map(location=map_center, zoom_start=12)
 
 # Known coordinates for San Jose zip codes
 known_zipcode_coords = {
@@ -104,17 +111,23 @@ known_zipcode_coords = {
     "95120": (37.2060, -121.8133)
 }
 
-# Add markers for each selected zipcode
-for zipcode in selected_zipcodes:
-    if zipcode in known_zipcode_coords:
-        lat, lon = known_zipcode_coords[zipcode]
-        folium.Marker(
-            location=[lat, lon],
-            popup=f"Zipcode: {zipcode}",
-            icon=folium.Icon(color="blue", icon="info-sign")
-        ).add_to(m)
-
-st_folium(m, width=700, height=500)
+# Plot each selected zipcode as a point in a WebGL scatter layer, with the zipcode as tooltip
+markers_df = pd.DataFrame(
+    [(*known_zipcode_coords[zipcode], zipcode) for zipcode in selected_zipcodes if zipcode in known_zipcode_coords],
+    columns=["lat", "lon", "Zipcode"],
+)
+st.pydeck_chart(pdk.Deck(
+    layers=[pdk.Layer(
+        "ScatterplotLayer",
+        data=markers_df,
+        get_position=["lon", "lat"],
+        get_fill_color=[0, 92, 230, 200],
+        get_radius=300,
+        pickable=True,
+    )],
+    initial_view_state=pdk.ViewState(latitude=MAP_CENTER[0], longitude=MAP_CENTER[1], zoom=11),
+    tooltip={"text": "Zipcode: {Zipcode}"},
+))
 
 # Step 6: Download Filtered Data for Offline Analysis
 st.markdown("### Step 6: Download Data for Offline Analysis")
@@ -1,9 +1,5 @@
 import streamlit as st  
-import pandas as pd
-import os
-
-# Define the path to the CSV file used by the Manual Input page
-DATA_FILE = "water_quality_data.csv"
+from data_io import load_data, data_version
 
 # Define safe ranges and friendly descriptions for each parameter
 SAFE_RANGES = {
@@ -38,11 +34,12 @@ SAFE_RANGES = {
 def is_within_safe_range(value, min_val, max_val):
     return min_val <= value <= max_val
 
-# Load water quality data from the CSV file
-def load_data():
-    if os.path.exists(DATA_FILE):
-        return pd.read_csv(DATA_FILE, parse_dates=["Date"])
-    return pd.DataFrame(columns=["Zipcode", "Date", "pH", "Chlorine (mg/L)", "Hardness (mg/L as CaCO3)", "Nitrates (mg/L)", "Lead (µg/L)"])
+# Dates available for each zipcode, cached until the data changes; older versions are never
+# read again, so only a few entries are kept
+@st.cache_data(max_entries=4, show_spinner=False)
+def get_zip_date_index(version):
+    data = load_data()
+    return {zipcode: dates.dt.normalize().drop_duplicates().tolist() for zipcode, dates in data.groupby("Zipcode", observed=True)["Date"]}
 
 # Set up Streamlit interface
 st.title("Water Quality Dashboard for Regular Users")
@@ -53,22 +50,19 @@ data = load_data()
 
 # Check if there is data available
 if not data.empty:
-    # Convert the 'Date' column to datetime format
-    data["Date"] = pd.to_datetime(data["Date"])
-
     # Step 1: Select Zipcode
     st.markdown("### Select Zipcode and Date for Analysis")
-    unique_zipcodes = data["Zipcode"].unique()
-    selected_zipcode = st.selectbox("Choose a Zipcode to view analysis:", options=unique_zipcodes)
+    zip_date_index = get_zip_date_index(data_version())
+    selected_zipcode = st.selectbox("Choose a Zipcode to view analysis:", options=list(zip_date_index))
 
     # Step 2: Select Date
     # Filter data by the selected Zipcode first
     zipcode_data = data[data["Zipcode"] == selected_zipcode]
-    available_dates = zipcode_data["Date"].dt.date.unique()
-    selected_date = st.selectbox("Choose a Date:", options=available_dates)
+    available_dates = zip_date_index[selected_zipcode]
+    selected_date = st.selectbox("Choose a Date:", options=available_dates, format_func=lambda date: date.strftime("%Y-%m-%d"))
 
     # Step 3: Filter by Date and Zipcode
-    selected_data = zipcode_data[zipcode_data["Date"].dt.date == selected_date]
+    selected_data = zipcode_data[zipcode_data["Date"].dt.normalize() == selected_date]
 
     if not selected_data.empty:
         st.markdown("### Water Quality Measurements on Selected Date and Location")
@@ -99,7 +93,7 @@ if not data.empty:
             st.write(f"**Health Impact**: {details['health_impact']}")
 
             # Visual indicator with progress bar
-            st.progress(min(current_value / max(safe_max, current_value), 1.0))
+            st.progress(float(min(current_value / max(safe_max, current_value), 1.0)))
 
             # Suggest actions if out of safe range
             if not in_safe_range:
@@ -0,0 +1,125 @@
+import os
+import threading
+import duckdb
+import pandas as pd
+import streamlit as st
+
+# Define DuckDB database file to store water quality data
+DB_FILE = "water_quality_data.duckdb"
+# Older installs kept the data in one of these files; it is imported when the database is created
+LEGACY_DATA_FILES = ["water_quality_data.parquet", "water_quality_data.csv"]
+COLUMNS = ["Zipcode", "Date", "pH", "Chlorine (mg/L)", "Hardness (mg/L as CaCO3)", "Nitrates (mg/L)", "Lead (µg/L)"]
+
+# Measurements are stored as float32, which is plenty for test-kit readings and halves memory use,
+# and the handful of repeated zipcodes as a category
+DTYPES = {"Zipcode": "category", **{column: "float32" for column in COLUMNS[2:]}}
+
+# Quote column names for SQL (they contain spaces and parentheses)
+def _quote(columns):
+    return ", ".join(f'"{column}"' for column in columns)
+
+# Open the database once per process, creating the table (and importing old data) on first use
+@st.cache_resource(show_spinner=False)
+def get_connection():
+    con = duckdb.connect(DB_FILE)
+    # Create the table and import old data in one transaction, so a failed import is retried next time
+    con.execute("BEGIN TRANSACTION")
+    try:
+        is_new = con.execute("SELECT count(*) FROM information_schema.tables WHERE table_name = 'wq'").fetchone()[0] == 0
+        con.execute("CREATE SEQUENCE IF NOT EXISTS wq_id")
+        measurement_columns = ", ".join(f'"{column}" FLOAT' for column in COLUMNS[2:])
+        con.execute(f"""CREATE TABLE IF NOT EXISTS wq (id BIGINT DEFAULT nextval('wq_id'), "Zipcode" VARCHAR, "Date" TIMESTAMP, {measurement_columns})""")
+        if is_new:
+            for path in LEGACY_DATA_FILES:
+                if os.path.exists(path):
+                    if path.endswith(".parquet"):
+                        legacy_data = pd.read_parquet(path)
+                    else:
+                        legacy_data = pd.read_csv(path, parse_dates=["Date"], dtype={"Zipcode": str})
+                    con.register("legacy_data", legacy_data.reindex(columns=COLUMNS).astype({"Zipcode": str}))
+                    con.execute(f"INSERT INTO wq ({_quote(COLUMNS)}) SELECT {_quote(COLUMNS)} FROM legacy_data")
+                    con.unregister("legacy_data")
+                    break
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        con.close()
+        raise
+    return con
+
+# DuckDB connections aren't thread-safe, so each call (and Streamlit session) uses its own cursor
+def _cursor():
+    return get_connection().cursor()
+
+# Process-wide counter bumped on every write, used to key cached query results; the lock keeps
+# concurrent writes from different Streamlit sessions from producing the same version
+@st.cache_resource(show_spinner=False)
+def _version():
+    return {"value": 0, "lock": threading.Lock()}
+
+def data_version():
+    return _version()["value"]
+
+# Results for older versions can never be read again, so drop them on every write
+def _bump_version():
+    version = _version()
+    with version["lock"]:
+        version["value"] += 1
+    _query.clear()
+
+# Run a query, cached (and shared by all pages) until the next write; max_entries bounds the
+# number of dashboard filter combinations kept between writes
+@st.cache_data(max_entries=64, show_spinner=False)
+def _query(sql, params, version):
+    data = _cursor().execute(sql, list(params)).fetchdf()
+    return data.set_index("id").astype(DTYPES)
+
+# Load water quality data indexed by row id; filters are pushed down into the SQL query
+def load_data(zipcodes=None, start=None, end=None):
+    conditions, params = [], []
+    if zipcodes:
+        conditions.append('"Zipcode" IN (SELECT unnest(?))')
+        params.append([str(zipcode) for zipcode in zipcodes])
+    if start is not None:
+        conditions.append('"Date" >= ?')
+        params.append(pd.Timestamp(start).to_pydatetime())
+    if end is not None:
+        conditions.append('"Date" <= ?')
+        params.append(pd.Timestamp(end).to_pydatetime())
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return _query(f"SELECT id, {_quote(COLUMNS)} FROM wq{where} ORDER BY id", tuple(params), data_version())
+
+# Insert one reading, given as a dict of column values, on the given cursor
+def _insert_reading(cursor, reading):
+    columns = [column for column in COLUMNS if column in reading]
+    placeholders = ", ".join("?" for _ in columns)
+    cursor.execute(f"INSERT INTO wq ({_quote(columns)}) VALUES ({placeholders})", [reading[column] for column in columns])
+
+def add_reading(reading):
+    try:
+        _insert_reading(_cursor(), reading)
+    finally:
+        _bump_version()
+
+# Apply the changes recorded by st.data_editor; row positions are mapped through ids, the row ids of the table as rendered
+# All changes are written in one transaction, so a failing value leaves the table untouched
+def apply_edits(ids, edits):
+    cursor = _cursor()
+    cursor.execute("BEGIN TRANSACTION")
+    try:
+        deleted_ids = [int(ids[position]) for position in edits.get("deleted_rows", [])]
+        if deleted_ids:
+            cursor.execute("DELETE FROM wq WHERE id IN (SELECT unnest(?))", [deleted_ids])
+        for position, changes in edits.get("edited_rows", {}).items():
+            changes = {column: value for column, value in changes.items() if column in COLUMNS}
+            if changes:
+                assignments = ", ".join(f'"{column}" = ?' for column in changes)
+                cursor.execute(f"UPDATE wq SET {assignments} WHERE id = ?", [*changes.values(), int(ids[int(position)])])
+        for row in edits.get("added_rows", []):
+            _insert_reading(cursor, row)
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+    finally:
+        _bump_version()
@@ -0,0 +1,12 @@
+import folium
+import streamlit as st
+
+# Map center (San Jose)
+MAP_CENTER = [37.3382, -121.8863]
+
+# Build the location-picker map once per process; clicking it shows the clicked coordinates
+@st.cache_resource(show_spinner=False)
+def base_map():
+    m = folium.Map(location=MAP_CENTER, zoom_start=12)
+    m.add_child(folium.LatLngPopup())
+    return m
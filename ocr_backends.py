@@ -0,0 +1,109 @@
+import os
+import tempfile
+import warnings
+
+# Exported ONNX models are kept here so the export only happens on the first run
+ONNX_DIR = os.path.expanduser("~/.cache/easyocr-onnx")
+
+# Wrapper that lets a compiled model stand in for the PyTorch module EasyOCR calls
+class CompiledModel:
+    def __init__(self, run):
+        self.run = run
+
+    def eval(self):
+        return self
+
+    def __call__(self, image, *args):
+        import torch
+        outputs = [torch.from_numpy(out) for out in self.run(image.cpu().numpy())]
+        return outputs[0] if len(outputs) == 1 else tuple(outputs)
+
+# The recognizer takes a (unused) text argument, so export it with the image only
+# (built on first use so importing this module doesn't require torch)
+def _image_only(model):
+    import torch
+
+    class _ImageOnly(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, image):
+            return self.model(image, None)
+    return _ImageOnly(model)
+
+# Export the detector and recognizer to ONNX once, with dynamic batch and image sizes
+def export_onnx(reader):
+    import torch
+    os.makedirs(ONNX_DIR, exist_ok=True)
+    models = {
+        "detector": (
+            getattr(reader.detector, "module", reader.detector),
+            torch.zeros(1, 3, 608, 800),
+            ["y", "feature"],
+            {"input": {0: "batch", 2: "height", 3: "width"},
+             "y": {0: "batch", 1: "y_height", 2: "y_width"},
+             "feature": {0: "batch", 2: "f_height", 3: "f_width"}},
+        ),
+        "recognizer": (
+            _image_only(getattr(reader.recognizer, "module", reader.recognizer)),
+            torch.zeros(1, 1, 64, 256),
+            ["preds"],
+            {"input": {0: "batch", 3: "width"}, "preds": {0: "batch", 1: "steps"}},
+        ),
+    }
+
+    paths = {}
+    for name, (module, dummy_input, output_names, dynamic_axes) in models.items():
+        path = os.path.join(ONNX_DIR, f"{name}.onnx")
+        if not os.path.exists(path):
+            # Export to a temp file and move it into place, so a failed export never leaves a broken model behind
+            fd, tmp_path = tempfile.mkstemp(dir=ONNX_DIR, suffix=".onnx.tmp")
+            os.close(fd)
+            try:
+                torch.onnx.export(module.eval(), dummy_input, tmp_path, input_names=["input"], output_names=output_names, dynamic_axes=dynamic_axes, opset_version=17)
+                os.replace(tmp_path, path)
+            except Exception as e:
+                warnings.warn(f"Could not export the EasyOCR {name} to ONNX, keeping PyTorch: {e}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                continue
+        paths[name] = path
+    return paths
+
+# Compile an ONNX model with OpenVINO on the given device ("CPU" or "GPU" for Intel iGPUs)
+def openvino_runner(path, device="CPU"):
+    from openvino import Core
+    compiled = Core().compile_model(path, device)
+
+    def run(image):
+        result = compiled(image)
+        return [result[output] for output in compiled.outputs]
+    return run
+
+# Load an ONNX model into an ONNX Runtime CPU session with full graph optimizations
+def onnxruntime_runner(path):
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = os.cpu_count()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def run(image):
+        return session.run(None, {"input": image})
+    return run
+
+# Swap the reader's PyTorch models for compiled ones, leaving any that fail in PyTorch
+# (device only applies to OpenVINO; ONNX Runtime always runs on the CPU)
+def accelerate_reader(reader, backend, device="CPU"):
+    runners = {"openvino": lambda path: openvino_runner(path, device), "onnxruntime": onnxruntime_runner}
+    if backend not in runners:
+        warnings.warn(f"Unknown OCR backend '{backend}', keeping PyTorch.")
+        return reader
+
+    for name, path in export_onnx(reader).items():
+        try:
+            setattr(reader, name, CompiledModel(runners[backend](path)))
+        except Exception as e:
+            warnings.warn(f"Could not load the EasyOCR {name} with {backend}, keeping PyTorch: {e}")
+    return reader